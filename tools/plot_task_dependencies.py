@@ -6,11 +6,16 @@ dependencies.
 
 Example: ./plot_task_dependencies.py dependency_graph.csv
 """
-from pandas import read_csv
-import numpy as np
-from subprocess import call
+from subprocess import run
 import argparse
-from os import path
+import csv
+import re
+from collections import defaultdict
+from dataclasses import dataclass, fields
+from functools import lru_cache, partial
+from io import StringIO
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from os import path, rename
 
 # define task colours in the dict here:
 task_colours = {
@@ -22,6 +27,95 @@ task_colours = {
     "sink": "lightseagreen",
 }
 
+# regular expressions matching the task categories, in priority order.
+# The patterns only use lookaheads anchored at the start of the name,
+# so they can be fused into the single classifying pattern below.
+task_category_regex = {
+    "black_holes": r"(?=.*(?:bh|bpart|swallow))",
+    "stars": r"(?=.*(?:stars|spart|sf_count))",
+    "hydro": (
+        r"(?=.*(?:hydro|_part))"
+        r"|(?=.*density)(?!.*(?:stars|bh))"
+        r"|(?=.*rho)(?!.*bpart)"
+        r"|(?=.*gradient)(?!.*rt_gradient)"
+        r"|(?=.*force)(?!.*grav)"
+        r"|(?=.*xv)(?!.*bpart)"
+        r"|(?=(?:sort|ghost_in|ghost_out|extra_ghost|ghost|"
+        r"cooling_in|cooling_out|cooling|star_formation)$)"
+    ),
+    "gravity": r"(?=.*(?:gpart|grav))",
+    "RT": r"(?=.*_rt)|(?=rt_)",
+    "sink": r"(?=.*sink)",
+}
+
+# all the categories fused into a single compiled pattern; the named
+# group that matched tells us the category in one scan of the name
+task_category_re = re.compile(
+    "|".join(
+        "(?P<%s>%s)" % (category, regex)
+        for category, regex in task_category_regex.items()
+    )
+)
+
+
+@dataclass
+class Dependency:
+    """
+    One row of the dependency .csv file written by SWIFT,
+    plus the colour assigned to the unlocking task.
+    """
+
+    # keep the instances small; we hold one per row of the file
+    __slots__ = (
+        "task_in",
+        "task_out",
+        "implicit_in",
+        "implicit_out",
+        "mpi_in",
+        "mpi_out",
+        "cluster_in",
+        "cluster_out",
+        "number_link",
+        "number_rank",
+        "task_in_is_top",
+        "task_in_is_hydro_super",
+        "task_in_is_grav_super",
+        "task_out_is_top",
+        "task_out_is_hydro_super",
+        "task_out_is_grav_super",
+        "cell_has_active_task",
+        "task_colour",
+    )
+
+    task_in: str
+    task_out: str
+    implicit_in: int
+    implicit_out: int
+    mpi_in: int
+    mpi_out: int
+    cluster_in: str
+    cluster_out: str
+    number_link: int
+    number_rank: int
+    task_in_is_top: int
+    task_in_is_hydro_super: int
+    task_in_is_grav_super: int
+    task_out_is_top: int
+    task_out_is_hydro_super: int
+    task_out_is_grav_super: int
+    cell_has_active_task: int
+    task_colour: str
+
+
+# the columns of Dependency that are read from the file, and which of
+# them hold integers
+_csv_columns = [f.name for f in fields(Dependency) if f.name != "task_colour"]
+_int_columns = {
+    c
+    for c in _csv_columns
+    if c not in ("task_in", "task_out", "cluster_in", "cluster_out")
+}
+
 
 def parse_args():
     """
@@ -63,6 +157,25 @@ def parse_args():
         action="store_true",
     )
 
+    parser.add_argument(
+        "-k",
+        "--keep-dot",
+        dest="keep_dot",
+        help="Keep the intermediate .dot file instead of piping the "
+        "graph straight into dot (implied by --with-calls)",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        dest="jobs",
+        type=int,
+        default=1,
+        help="Number of parallel jobs to use, both for processing the "
+        "input files and for rendering the graphs with dot",
+    )
+
     parser.add_argument(
         "files",
         nargs="+",
@@ -74,9 +187,14 @@ def parse_args():
     args = parser.parse_args()
     files = args.files
 
-    for f in files:
-        if not path.exists(f):
-            raise FileNotFoundError("You need to provide one file")
+    # stat the files concurrently; one serial stat per file can be
+    # slow on network filesystems
+    with ThreadPoolExecutor(max_workers=8) as ex:
+        exists = list(ex.map(path.exists, files))
+
+    missing = [f for f, ok in zip(files, exists) if not ok]
+    if missing:
+        raise FileNotFoundError("File(s) not found: %s" % ", ".join(missing))
 
     if args.with_calls and args.with_levels:
         raise ValueError(
@@ -87,243 +205,152 @@ def parse_args():
     return args, files
 
 
-def get_git_version(f, git):
-    """
-    Read the git version from the file
-
-    Parameters
-    ----------
-
-    f: str
-        Filename
-
-    git: str
-        Git version of previous file
-
-    Returns
-    -------
-
-    new_git: str
-        Git version of current file
-    """
-    # read comment in csv file
-    with open(f, "r") as f:
-        line = f.readline()
-
-    # check if really a comment
-    if line[0] != "#":
-        return None
-
-    # remove trailing characters
-    new_git = line[2:].rstrip()
-
-    # check if previous and current are the same
-    if git is not None and git != new_git:
-        raise Exception("Files were not produced by the same version")
-
-    return new_git
-
-
-def get_task_colour(taskname):
+def read_dependency_csv(filename):
     """
-    Get the task colour based on its name.
-    Default colour is black.
+    Read a task dependency .csv file into a list of Dependency rows.
 
+    The file only ever gets iterated sequentially, so the plain csv
+    module feeding small fixed-slot instances beats a full DataFrame
+    here (and drops the pandas import from the startup time).
 
     Parameters
     ----------
 
-    taskname: str
-        name of the task at hand
-
+    filename: str
+        Filename of the .csv file
 
     Returns
     -------
 
-    colour: str
-        colour string directly applicable in the dot file.
-    """
-
-    colour = "black"
-    if task_is_black_holes(taskname):
-        colour = task_colours["black_holes"]
-    elif task_is_stars(taskname):
-        colour = task_colours["stars"]
-    elif task_is_hydro(taskname):
-        colour = task_colours["hydro"]
-    elif task_is_gravity(taskname):
-        colour = task_colours["gravity"]
-    elif task_is_RT(taskname):
-        colour = task_colours["RT"]
-    elif task_is_sink(taskname):
-        colour = task_colours["sink"]
+    data: list
+        List of Dependency rows
 
-    return colour
-
-
-def task_is_black_holes(name):
-    """
-    Does the task concern black holes?
-
-    Parameters
-    ----------
-
-    name: str
-        Task name
+    git: str
+        Git version the file was produced with, or None if the
+        file carries no version header
     """
-    if "bh" in name or "bpart" in name or "swallow" in name:
-        return True
-    return False
+    with open(filename, "r", newline="") as f:
+        # the first line holds the git version as a '# ...' comment
+        line = f.readline()
+        git = line[2:].rstrip() if line.startswith("#") else None
+        if git is None:
+            f.seek(0)
 
+        reader = csv.reader(f)
+        header = next(reader)
 
-def task_is_stars(name):
-    """
-    Does the task concern stars?
+        # map each Dependency field to its position in the file;
+        # only the columns we actually use get materialized, any
+        # extra columns in the file are simply ignored
+        index = {name: i for i, name in enumerate(header)}
+        missing = [c for c in _csv_columns if c not in index]
+        if missing:
+            raise Exception(
+                "Missing column(s) in %s: %s" % (filename, ", ".join(missing))
+            )
+        order = [(index[c], c in _int_columns) for c in _csv_columns]
 
-    Parameters
-    ----------
+        # skip blank lines, as pandas used to do
+        data = [
+            Dependency(
+                *(int(row[i]) if is_int else row[i] for i, is_int in order), "black"
+            )
+            for row in reader
+            if row
+        ]
 
-    name: str
-        Task name
-    """
-    if "stars" in name or "spart" in name:
-        return True
-    if "sf_count" in name:
-        return True
+    return data, git
 
-    return False
 
-
-def task_is_hydro(name):
+@lru_cache(maxsize=None)
+def classify_task(name):
     """
-    Does the task concern the hydro?
+    Get the category of a task based on its name.
 
     Parameters
     ----------
 
     name: str
         Task name
-    """
-    if "hydro" in name:
-        return True
-    if "_part" in name:
-        return True
-    if "density" in name and "stars" not in name and "bh" not in name:
-        return True
-    if "rho" in name and "bpart" not in name:
-        return True
-    if "gradient" in name and "rt_gradient" not in name:
-        return True
-    if "force" in name and "grav" not in name:
-        return True
-    if "xv" in name and "bpart" not in name:
-        return True
-
-    task_name = [
-        "sort",
-        "ghost_in",
-        "ghost",
-        "ghost_out",
-        "extra_ghost",
-        "cooling",
-        "cooling_in",
-        "cooling_out",
-        "star_formation",
-    ]
-    if name in task_name:
-        return True
-    return False
 
+    Returns
+    -------
 
-def task_is_gravity(name):
+    category: str
+        Key into task_colours, or None if the task
+        belongs to no category
     """
-    Does the task concern the gravity?
+    m = task_category_re.match(name)
+    if m is None:
+        return None
+    return m.lastgroup
 
-    Parameters
-    ----------
 
-    name: str
-        Task name
+@lru_cache(maxsize=None)
+def get_task_colour(taskname):
     """
-    if "gpart" in name:
-        return True
-    if "grav" in name:
-        return True
-    return False
-
+    Get the task colour based on its name.
+    Default colour is black.
 
-def task_is_RT(name):
-    """
-    Does the task concern Radiative Transfer?
 
     Parameters
     ----------
 
-    name: str
-        Task name
-    """
-    if "_rt" in name:
-        return True
-    elif name.startswith("rt_"):
-        return True
-    return False
-
+    taskname: str
+        name of the task at hand
 
-def task_is_sink(name):
-    """
-    Does the task concern the sink particles?
 
-    Parameters
-    ----------
+    Returns
+    -------
 
-    name: str
-        Task name
+    colour: str
+        colour string directly applicable in the dot file.
     """
-    if "sink" in name:
-        return True
-    return False
+    return task_colours.get(classify_task(taskname), "black")
 
 
-def get_function_calls(name):
-    txt = None
-    if name == "ghost":
-        txt = """hydro_end_density, chemistry_end_density,<br/>
+# static function-call annotations for --with-calls, keyed by task
+# name; a single dict probe replaces the old if/elif chain
+function_calls = {
+    "ghost": """hydro_end_density, chemistry_end_density,<br/>
         hydro_prepare_gradient, hydro_reset_gradient,<br/>
         hydro_prepare_force, hydro_reset_acceleration,<br/>
         hydro_init_part, chemistry_init_part,<br/>
         hydro_has_no_neighbours, chemistry_part_has_no_neighbours
-        """
-
-    elif name == "cooling":
-        txt = "cooling_cool_part"
-
-    elif name == "timestep":
-        txt = "tracers_after_timestep"
-
-    elif name == "drift_part":
-        txt = """drift_part, tracers_after_drift,<br/>
+        """,
+    "cooling": "cooling_cool_part",
+    "timestep": "tracers_after_timestep",
+    "drift_part": """drift_part, tracers_after_drift,<br/>
         hydro_init_part, chemistry_init_part,<br/>
         tracers_after_init
-        """
-
-    elif name == "kick1":
-        txt = "kick_part, kick_gpart, kick_spart"
-
-    elif name == "kick2":
-        txt = """kick_part, kick_gpart, kick_spart,<br/>
+        """,
+    "kick1": "kick_part, kick_gpart, kick_spart",
+    "kick2": """kick_part, kick_gpart, kick_spart,<br/>
         hydro_reset_predicted_values,
         gravity_reset_predicted_Values,<br/>
         stars_reset_predicted_values,
-        """
+        """,
+    "end_force": """hydro_end_force, gravity_end_force,<br/>
+        stars_end_force""",
+    "drift_gpart": """drift_gpart, gravity_init_gpart,<br/>
+        drift_spart
+        """,
+}
 
-    elif name == "end_force":
-        txt = """hydro_end_force, gravity_end_force,<br/>
-        stars_end_force"""
 
-    elif name == "drift_gpart":
-        txt = """drift_gpart, gravity_init_gpart,<br/>
-        drift_spart
-        """
+@lru_cache(maxsize=None)
+def get_function_calls(name):
+    """
+    Get the dot label listing the functions called by a task,
+    or None if we have nothing to say about it.
+
+    Parameters
+    ----------
+
+    name: str
+        Task name
+    """
+    txt = function_calls.get(name)
 
     if "density" in name and "stars" not in name:
         txt = """runner_iact_nonsym_chemistry, runner_iact_chemistry,<br/>
@@ -334,10 +361,7 @@ def get_function_calls(name):
 
     if txt is None:
         return None
-    else:
-        pre = "<" + name + "<BR/> <Font POINT-SIZE='10'>Calls: "
-        app = "</Font>>"
-        return pre + txt + app
+    return f"<{name}<BR/> <Font POINT-SIZE='10'>Calls: {txt}</Font>>"
 
 
 def write_task(
@@ -398,22 +422,23 @@ def write_task(
     if name == "task_unlocks_nothing":
         return
 
-    # generate text
-    txt = "\t " + name + "["
+    # generate text; collect the pieces in a list and join them
+    # once rather than growing a string
+    parts = ["\t " + name + "["]
 
     if not cell_has_active_task:
         # give this precedence over implicit tasks and MPI
         # If you're this deep in debugging trouble,
         # you will most likely know which tasks are
         # implicit.
-        txt += "style=filled,fillcolor=lightpink2,"
+        parts.append("style=filled,fillcolor=lightpink2,")
         if mpi:
-            txt += "shape=diamond,"
+            parts.append("shape=diamond,")
     else:
         if implicit:
-            txt += "style=filled,fillcolor=grey90,"
+            parts.append("style=filled,fillcolor=grey90,")
         if mpi:
-            txt += "shape=diamond,style=filled,fillcolor=azure,"
+            parts.append("shape=diamond,style=filled,fillcolor=azure,")
     if with_levels:
         levelstr = ""
         if task_is_in_top:
@@ -438,29 +463,31 @@ def write_task(
         ):
             levelstr = "below super"
 
-        txt += "\n\t\tlabel=<\n"
-        txt += '\t\t\t<TABLE BORDER="0" CELLBORDER="0" CELLSPACING="0">\n'
-        txt += (
+        parts.append("\n\t\tlabel=<\n")
+        parts.append('\t\t\t<TABLE BORDER="0" CELLBORDER="0" CELLSPACING="0">\n')
+        parts.append(
             '\t\t\t\t<TR> <TD> <B> <FONT POINT-SIZE="18">'
             + name
             + " </FONT> </B> </TD> </TR> <!-- task name -->\n"
         )
-        txt += (
+        parts.append(
             '\t\t\t\t<TR> <TD> <FONT POINT-SIZE="18">'
             + levelstr
             + "</FONT> </TD> </TR> <!-- task level -->\n"
         )
-        txt += "\t\t\t</TABLE>\n"
-        txt += "\t\t\t>,\n\t\t"
+        parts.append("\t\t\t</TABLE>\n")
+        parts.append("\t\t\t>,\n\t\t")
 
     col = get_task_colour(name)
 
-    txt += "color=%s," % col
+    parts.append("color=%s," % col)
 
     if with_calls:
         func = get_function_calls(name)
         if func is not None:
-            txt += "label=" + func + ","
+            parts.append("label=" + func + ",")
+
+    txt = "".join(parts)
 
     # remove extra ','
     if txt[-1] == ",":
@@ -481,8 +508,8 @@ def write_header(f, data, git, opt):
     f: File
         File where to write the data
 
-    data: DataFrame
-        The dataframe to write
+    data: list
+        List of Dependency rows to write
 
     git: str
         The git version
@@ -503,50 +530,50 @@ def write_header(f, data, git, opt):
 
     # write the special task
     f.write("\t # Special tasks\n")
-    N = len(data)
-    written = []
-    # do task in
-    for i in range(N):
-        ta = data["task_in"][i]
-        if ta in written:
-            continue
 
-        written.append(ta)
-        write_task(
-            f,
-            ta,
-            data["implicit_in"][i],
-            data["mpi_in"][i],
-            data["task_in_is_top"][i] == 1,
-            data["task_in_is_hydro_super"][i] == 1,
-            data["task_in_is_grav_super"][i] == 1,
-            True,
-            opt.with_calls,
-            opt.with_levels,
-        )
-        # Note: In the case where you are plotting a single cell,
-        # any task only gets an entry in tasks_in if the specific
-        # cell has an active task of that type.
-
-    # do task out
-    for i in range(N):
-        tb = data["task_out"][i]
-        if tb in written:
-            continue
-
-        written.append(tb)
-        write_task(
-            f,
-            tb,
-            data["implicit_out"][i],
-            data["mpi_out"][i],
-            data["task_out_is_top"][i] == 1,
-            data["task_out_is_hydro_super"][i] == 1,
-            data["task_out_is_grav_super"][i] == 1,
-            data["cell_has_active_task"][i] == 1,
-            opt.with_calls,
-            opt.with_levels,
-        )
+    # the CSV holds one row per dependency, so every task name
+    # repeats many times; only write each task once. A single pass
+    # over the rows handles both the task_in and the task_out side.
+    # Tasks appearing as task_in carry the authoritative attributes
+    # (see the note below), so never write those from their
+    # task_out occurrences.
+    names_in = {row.task_in for row in data}
+    written = set()
+    for row in data:
+        # do task in
+        if row.task_in not in written:
+            written.add(row.task_in)
+            write_task(
+                f,
+                row.task_in,
+                row.implicit_in,
+                row.mpi_in,
+                row.task_in_is_top == 1,
+                row.task_in_is_hydro_super == 1,
+                row.task_in_is_grav_super == 1,
+                True,
+                opt.with_calls,
+                opt.with_levels,
+            )
+            # Note: In the case where you are plotting a single cell,
+            # any task only gets an entry in tasks_in if the specific
+            # cell has an active task of that type.
+
+        # do task out
+        if row.task_out not in written and row.task_out not in names_in:
+            written.add(row.task_out)
+            write_task(
+                f,
+                row.task_out,
+                row.implicit_out,
+                row.mpi_out,
+                row.task_out_is_top == 1,
+                row.task_out_is_hydro_super == 1,
+                row.task_out_is_grav_super == 1,
+                row.cell_has_active_task == 1,
+                opt.with_calls,
+                opt.with_levels,
+            )
 
     f.write("\n")
 
@@ -569,12 +596,13 @@ def write_cluster(f, tasks, cluster):
 
     """
 
-    f.write("\t subgraph cluster%s {\n" % cluster)
-    f.write('\t\t label="";\n')
-    f.write('\t\t bgcolor="grey99";\n')
+    parts = ["\t subgraph cluster%s {\n" % cluster]
+    parts.append('\t\t label="";\n')
+    parts.append('\t\t bgcolor="grey99";\n')
     for t in tasks:
-        f.write("\t\t %s;\n" % t)
-    f.write("\t };\n\n")
+        parts.append("\t\t %s;\n" % t)
+    parts.append("\t };\n\n")
+    f.write("".join(parts))
 
 
 def write_clusters(f, data):
@@ -587,32 +615,25 @@ def write_clusters(f, data):
     f: File
         File where to write the data
 
-    data: DataFrame
-        The dataframe to write
+    data: list
+        List of Dependency rows to write
     """
     f.write("\t # Clusters\n")
-    # get list of all the clusters
-    clusters = data[["cluster_in", "cluster_out"]]
-    clusters = np.unique(clusters)
 
-    cluster_in = data["cluster_in"]
-    cluster_out = data["cluster_out"]
+    # gather the tasks of every cluster in a single pass
+    clusters = defaultdict(set)
+    for row in data:
+        clusters[row.cluster_in].add(row.task_in)
+        clusters[row.cluster_out].add(row.task_out)
+
     # loop over all clusters
-    for cluster in clusters:
+    for cluster in sorted(clusters):
         # is it a cluster?
         if cluster == "None":
             continue
 
-        # get all the task in current cluster
-        ta = data["task_in"][cluster_in == cluster]
-        tb = data["task_out"][cluster_out == cluster]
-
-        # make them unique
-        tasks = np.append(ta, tb)
-        tasks = np.unique(tasks)
-
         # write current cluster
-        write_cluster(f, tasks, cluster)
+        write_cluster(f, sorted(clusters[cluster]), cluster)
 
     f.write("\n")
 
@@ -627,43 +648,37 @@ def write_dependencies(f, data):
     f: File
         File where to write the data
 
-    data: DataFrame
-        The dataframe to write
+    data: list
+        List of Dependency rows to write
 
     """
-    f.write("\t # Dependencies\n")
-    N = len(data)
-    written = []
-    max_rank = data["number_rank"].max()
-    #  for i in range(N):
-    for i, l in data.iterrows():
-        # get data
-        ta = l["task_in"]
-        tb = l["task_out"]
-
-        # This feature is used to add tasks to the graph which have
-        # no dependencies. While such tasks are not expected to exist,
-        # it might be a helpful debugging feature.
-        if tb == "task_unlocks_nothing":
-            continue
-
-        number_link = l["number_link"]
+    # default guards against a header-only file with no dependencies
+    max_rank = max((row.number_rank for row in data), default=0)
 
-        # check if already done
-        name = "%s_%s" % (ta, tb)
-        if name in written:
-            raise Exception("Found two same task dependencies")
-
-        written.append(name)
-
-        # write relation
-        arrow = ",color=%s" % l["task_colour"]
-        if l["number_rank"] != max_rank:
-            arrow += ",style=dashed"
-        f.write(
-            "\t %s->%s[label=%i%s,fontcolor=%s]\n"
-            % (ta, tb, number_link, arrow, l["task_colour"])
+    # This feature is used to add tasks to the graph which have
+    # no dependencies. While such tasks are not expected to exist,
+    # it might be a helpful debugging feature.
+    edges = [row for row in data if row.task_out != "task_unlocks_nothing"]
+
+    # check for duplicated dependencies
+    if len({(row.task_in, row.task_out) for row in edges}) != len(edges):
+        raise Exception("Found two same task dependencies")
+
+    # build all the edge lines and write them in one go
+    lines = [
+        "\t %s->%s[label=%i,color=%s%s,fontcolor=%s]"
+        % (
+            row.task_in,
+            row.task_out,
+            row.number_link,
+            row.task_colour,
+            ",style=dashed" if row.number_rank != max_rank else "",
+            row.task_colour,
         )
+        for row in edges
+    ]
+
+    f.write("\t # Dependencies\n" + "\n".join(lines) + "\n")
 
 
 def write_footer(f):
@@ -688,61 +703,140 @@ def set_task_colours(data):
     Parameters
     ----------
 
-    data: DataFrame
-        DataFrame of all the tasks
+    data: list
+        List of Dependency rows
 
 
     Returns
     -------
 
-    data: DataFrame
-        modified DataFrame of all the tasks, now with more
+    data: list
+        modified list of Dependency rows, now with more
         colour
     """
 
-    N = len(data)
-
-    for i in range(N):
-        taskname = data["task_in"][i]
-        col = get_task_colour(taskname)
-        # set the colour
-        data.loc[i, "task_colour"] = col
+    # get_task_colour is cached, so this costs one dict probe per
+    # row and one classification per distinct name
+    for row in data:
+        row.task_colour = get_task_colour(row.task_in)
 
     return data
 
 
-if __name__ == "__main__":
+def render_graphs(dot_files):
+    """
+    Render a list of .dot files into .png images with a single
+    call to dot. Batching the files into one invocation avoids
+    paying the process startup cost once per graph.
 
-    args, files = parse_args()
+    Parameters
+    ----------
 
-    for f in files:
-        # output
-        basename = path.splitext(f)[0]
-        dot_output = basename + ".dot"
-        png_output = basename + ".png"
+    dot_files: list
+        List of .dot filenames to render
+    """
+    if len(dot_files) == 0:
+        return
+
+    run(["dot", "-Tpng", "-O"] + dot_files)
+
+    # dot -O appends the extension to the input filename,
+    # so rename graph.dot.png into the expected graph.png
+    for dot_file in dot_files:
+        tmp_output = dot_file + ".png"
+        if path.exists(tmp_output):
+            rename(tmp_output, path.splitext(dot_file)[0] + ".png")
 
-        # read file
-        data = []
-        git = None
-        data = read_csv(f, delimiter=",", comment="#")
-        git = get_git_version(f, git)
 
-        data = set_task_colours(data)
+def process_one(filename, args):
+    """
+    Generate the .dot file for a single dependency .csv file.
+
+    Parameters
+    ----------
+
+    filename: str
+        Filename of the .csv file
+
+    args: Namespace
+        The options provided to this script
+
+    Returns
+    -------
 
-        # write output
+    dot_output: str
+        Name of the .dot file that was written, or None if the
+        graph was piped straight into dot
+
+    git: str
+        Git version the file was produced with
+    """
+    # output
+    basename = path.splitext(filename)[0]
+    dot_output = basename + ".dot"
+    png_output = basename + ".png"
+
+    # read file
+    data, git = read_dependency_csv(filename)
+
+    data = set_task_colours(data)
+
+    # build the whole graph in memory and write it out in one go
+    buf = StringIO()
+    write_header(buf, data, git, args)
+
+    write_clusters(buf, data)
+
+    write_dependencies(buf, data)
+
+    write_footer(buf)
+
+    # the .dot file is only useful to the user with --with-calls
+    # (for xdot) or on request; otherwise skip the filesystem round
+    # trip and feed the graph to dot on stdin
+    if args.with_calls or args.keep_dot:
         with open(dot_output, "w") as f:
-            write_header(f, data, git, args)
+            f.write(buf.getvalue())
+        return dot_output, git
 
-            write_clusters(f, data)
+    run(["dot", "-Tpng", "-o", png_output], input=buf.getvalue(), text=True)
+    return None, git
 
-            write_dependencies(f, data)
 
-            write_footer(f)
+if __name__ == "__main__":
 
-        call(["dot", "-Tpng", dot_output, "-o", png_output])
+    args, files = parse_args()
+
+    # first pass: write all the .dot files. Each file is fully
+    # independent, so fan out across processes when several files
+    # were given
+    if len(files) > 1 and args.jobs > 1:
+        with ProcessPoolExecutor(max_workers=args.jobs) as ex:
+            results = list(ex.map(partial(process_one, args=args), files))
+    else:
+        results = [process_one(f, args) for f in files]
+
+    # graphs piped straight into dot are already rendered; only the
+    # .dot files kept on disk still need the batched render pass
+    dot_files = [dot_output for dot_output, _ in results if dot_output is not None]
+
+    # check that all the files were produced by the same version
+    gits = {git for _, git in results if git is not None}
+    if len(gits) > 1:
+        raise Exception("Files were not produced by the same version")
+
+    # second pass: render all the graphs, possibly in parallel
+    if args.jobs > 1:
+        chunks = [dot_files[i :: args.jobs] for i in range(args.jobs)]
+        with ThreadPoolExecutor(max_workers=args.jobs) as ex:
+            list(ex.map(render_graphs, chunks))
+    else:
+        render_graphs(dot_files)
 
-        print("You will find the graph in %s" % png_output)
+    for f in files:
+        basename = path.splitext(f)[0]
+        print("You will find the graph in %s.png" % basename)
 
         if args.with_calls:
             print("We recommand to use the python package xdot available on pypi:")
-            print("  python3 -m xdot %s" % dot_output)
+            print("  python3 -m xdot %s.dot" % basename)